@@ -21,7 +21,7 @@ if TYPE_CHECKING:
 import yaml
 
 
-def setup(hass: HomeAssistant, config: dict[str, Any]) -> bool:
+async def async_setup(hass: HomeAssistant, config: dict[str, Any]) -> bool:
     """
     Set up the custom component for Home Assistant.
 
@@ -50,10 +50,11 @@ def setup(hass: HomeAssistant, config: dict[str, Any]) -> bool:
     input_dir = hass.config.path(input_dir)
     output_dir = hass.config.path(output_dir)
 
-    # Register the process service.
-    def process_service(call: ServiceCall) -> None:
+    # Register the process service, running the blocking processing in the executor
+    # so that the event loop is not blocked meanwhile.
+    async def async_process_service(call: ServiceCall) -> None:
         try:
-            process_yaml_files(input_dir, output_dir)
+            await hass.async_add_executor_job(process_yaml_files, input_dir, output_dir)
             # if the processing is successful, reload the configuration
             on_success: str | None = call.data.get("on_success")
             if on_success == "reload":
@@ -61,18 +62,20 @@ def setup(hass: HomeAssistant, config: dict[str, Any]) -> bool:
                     "YAML processing completed successfully."
                     " Reloading Home Assistant configuration..."
                 )
-                hass.services.call("homeassistant", "reload_core_config", {})
+                await hass.services.async_call(
+                    "homeassistant", "reload_core_config", {}
+                )
             elif on_success == "restart":
                 LOGGER.info(
                     "YAML processing completed successfully."
                     " Restarting Home Assistant..."
                 )
-                hass.services.call("homeassistant", "restart", {})
+                await hass.services.async_call("homeassistant", "restart", {})
         except (FileNotFoundError, PermissionError, yaml.YAMLError):
             LOGGER.exception("Error during YAML preprocessing")
 
-    hass.services.register(
-        DOMAIN, "process", process_service, schema=SERVICE_PROCESS_SCHEMA
+    hass.services.async_register(
+        DOMAIN, "process", async_process_service, schema=SERVICE_PROCESS_SCHEMA
     )
     LOGGER.info(
         "Component '%s' loaded. Service '%s.process' is available.", DOMAIN, DOMAIN
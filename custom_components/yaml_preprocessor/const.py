@@ -18,7 +18,8 @@ LOGGER: logging.Logger = logging.getLogger(__package__)
 DOMAIN: str = "yaml_preprocessor"
 
 # Define the configuration schema for YAML Preprocessor.
-# This satisfies the requirement to define CONFIG_SCHEMA for integrations using setup.
+# This satisfies the requirement to define CONFIG_SCHEMA for integrations using
+# async_setup.
 CONFIG_SCHEMA = vol.Schema(
     {
         DOMAIN: vol.Schema(
@@ -48,8 +49,8 @@ AUTO_GENERATED_WARNING: str = (
 
 # Content of the README file in the output directory
 README_CONTENT: str = (
-    "WARNING: This directory is wiped and regenerated entirely during each "
-    "processing run.\n"
+    "WARNING: This directory is regenerated during each processing run, and any "
+    "file which does not come from the input directory is deleted.\n"
     "Do not modify the contents directly. Edit files in the input directory "
     "instead.\n"
 )
@@ -8,15 +8,76 @@ It includes:
   to an output directory.
 """
 
+import contextlib
+import copy
+import hashlib
+import io
+import json
+import os
 import re
 import shutil
+import sys
+import threading
+from collections.abc import Callable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from pathlib import Path
 from typing import Any
 
 import yaml
 
+try:
+    # Use the libyaml bindings when available, they are much faster
+    from yaml import CSafeDumper as _BaseDumper
+    from yaml import CSafeLoader as _BaseLoader
+except ImportError:
+    from yaml import SafeDumper as _BaseDumper
+    from yaml import SafeLoader as _BaseLoader
+
 from .const import AUTO_GENERATED_WARNING, LOGGER, README_CONTENT
 
+# Pattern matching the `${name}` variable placeholders in included files
+_VAR_RE: re.Pattern[str] = re.compile(r"\$\{(\w+)\}")
+
+# Caches of the included files, keyed by file path and modification time, so that a
+# file included many times is only read (and parsed when used without `vars`) once
+_FILE_CACHE: dict[tuple[str, int], str] = {}
+_PARSED_CACHE: dict[tuple[str, int], Any] = {}
+# Cache of the included file paths, keyed by including file and included relative path
+_RESOLVED_PATHS: dict[tuple[str, str], Path] = {}
+# Lock guarding the caches, as YAML files are processed in parallel
+_CACHE_LOCK = threading.Lock()
+
+
+# Extensions of the YAML files to process
+_YAML_SUFFIXES: tuple[str, ...] = (".yaml", ".yml")
+
+# Name of the file, in the output directory, recording the generated YAML files
+_MANIFEST_FILE_NAME: str = ".ypp_manifest.json"
+
+# Size of the buffer used to copy files when no zero-copy system call is available
+_COPY_BUFFER_SIZE: int = 1024 * 1024
+
+# Zero-copy system calls, as `(src_fd, dst_fd, count) -> copied`, tried in order to
+# copy the non YAML files to the output directory
+_ZERO_COPY_FUNCTIONS: list[Callable[[int, int, int], int]] = []
+if hasattr(os, "copy_file_range"):
+    _ZERO_COPY_FUNCTIONS.append(os.copy_file_range)
+if hasattr(os, "sendfile") and sys.platform.startswith("linux"):
+    _ZERO_COPY_FUNCTIONS.append(
+        lambda src_fd, dst_fd, count: os.sendfile(dst_fd, src_fd, None, count)
+    )
+
+
+# Loader and dumper holding our custom constructors and representers, so that the
+# ones of PyYAML (also used by Home Assistant) are left untouched
+class _Loader(_BaseLoader):
+    pass
+
+
+class _Dumper(_BaseDumper):
+    pass
+
 
 class MissingFileKeyError(ValueError):
     """
@@ -38,6 +99,9 @@ class MissingFileKeyError(ValueError):
 
 # Helper class to carry a tag with its associated value
 class _RawTag:
+    # Many of these can be created for a large configuration, keep them small
+    __slots__ = ("tag", "value")
+
     def __init__(self, tag: str, value: Any) -> None:
         self.tag = tag
         self.value = value
@@ -48,7 +112,7 @@ class _RawTag:
 
 # Custom representer for our RawTag object,
 # ensuring that the original tag (e.g. "!include_dir_list") is maintained.
-def _raw_tag_representer(dumper: yaml.Dumper, data: _RawTag) -> yaml.Node:
+def _raw_tag_representer(dumper: _Dumper, data: _RawTag) -> yaml.Node:
     if isinstance(data.value, str):
         # Represent a scalar with its original tag.
         return dumper.represent_scalar(data.tag, data.value)
@@ -62,32 +126,35 @@ def _raw_tag_representer(dumper: yaml.Dumper, data: _RawTag) -> yaml.Node:
 
 
 # Register the representer for RawTag objects.
-yaml.add_representer(_RawTag, _raw_tag_representer)
+_Dumper.add_representer(_RawTag, _raw_tag_representer)
+
+
+# Constructors of the value of an unrecognized tag, by kind of node ("scalar",
+# "sequence" or "mapping"), avoiding a chain of isinstance checks for each node
+_FALLBACK_DISPATCH: dict[str, Callable[[_Loader, yaml.Node], Any]] = {
+    "scalar": lambda _, node: node.value,  # Simply get the scalar value.
+    "sequence": _Loader.construct_sequence,
+    "mapping": _Loader.construct_mapping,
+}
 
 
 # Fallback constructor for unrecognized tags, with type hints.
-def _fallback_constructor(
-    loader: yaml.Loader | yaml.UnsafeLoader | yaml.FullLoader, tag: str, node: yaml.Node
-) -> _RawTag:
-    if isinstance(node, yaml.ScalarNode):
-        value: Any = node.value  # Simply get the scalar value.
-    elif isinstance(node, yaml.SequenceNode):
-        value = loader.construct_sequence(node)
-    elif isinstance(node, yaml.MappingNode):
-        value = loader.construct_mapping(node)
-    else:
-        value = loader.construct_object(node)
-    return _RawTag(tag, value)
+def _fallback_constructor(loader: _Loader, tag: str, node: yaml.Node) -> _RawTag:
+    construct = _FALLBACK_DISPATCH.get(node.id, _Loader.construct_object)
+    return _RawTag(tag, construct(loader, node))
 
 
 # Register the fallback constructor for any unrecognized tags
-yaml.Loader.add_multi_constructor("", _fallback_constructor)
+_Loader.add_multi_constructor("", _fallback_constructor)
+
+
+# Replacement of a `${name}` placeholder by its value, defaulting to an empty string
+def _replace_var(values: dict[str, str], match: re.Match[str]) -> str:
+    return values.get(match.group(1), "")
 
 
 # Define the custom constructor for !include
-def _include_constructor(
-    loader: yaml.Loader | yaml.UnsafeLoader | yaml.FullLoader, node: yaml.Node
-) -> Any:
+def _include_constructor(loader: _Loader, node: yaml.Node) -> Any:
     # Load the value of the !include tag
     if not isinstance(node, yaml.MappingNode):
         return _fallback_constructor(loader, "!include", node)
@@ -102,28 +169,59 @@ def _include_constructor(
     if not file_path:
         raise MissingFileKeyError
 
-    # Resolve the file path relative to the current directory
-    current_file_dir = Path(loader.name).parent  # Get the current file's directory
-    resolved_file_path = current_file_dir / file_path
+    # Resolve the file path relative to the current file's directory, reusing the path
+    # resolved for any previous include of the same file from the same file
+    path_key = (loader.name, file_path)
+    with _CACHE_LOCK:
+        resolved_file_path = _RESOLVED_PATHS.get(path_key)
+    if resolved_file_path is None:
+        current_file_dir = Path(loader.name).parent  # Get the current file's directory
+        resolved_file_path = current_file_dir / file_path
+        with _CACHE_LOCK:
+            _RESOLVED_PATHS[path_key] = resolved_file_path
+
+    cache_key = (resolved_file_path.as_posix(), resolved_file_path.stat().st_mtime_ns)
+    if not vars_substitutions:
+        with _CACHE_LOCK:
+            is_cached = cache_key in _PARSED_CACHE
+            cached_data = _PARSED_CACHE.get(cache_key)
+        if is_cached:
+            # Return a copy so that the loaded documents never share mutable nodes
+            return copy.deepcopy(cached_data)
 
     # Load the content of the referenced YAML file (B)
-    with resolved_file_path.open("r", encoding="utf-8") as f:
-        file_content = f.read()
+    with _CACHE_LOCK:
+        file_content = _FILE_CACHE.get(cache_key)
+    if file_content is None:
+        with resolved_file_path.open("r", encoding="utf-8") as f:
+            file_content = f.read()
+        with _CACHE_LOCK:
+            _FILE_CACHE[cache_key] = file_content
 
     # Replace variables (${xxx}) in the content with values from `vars`, defaulting to
-    # an empty string
-    file_content = re.sub(
-        r"\$\{(\w+)\}",
-        lambda match: str(vars_substitutions.get(match.group(1), "")),
-        file_content,
-    )
-
-    # Parse the substituted content back as YAML
-    return yaml.load(file_content, Loader=yaml.Loader)  # noqa: S506
+    # an empty string. The values are converted once, not once per placeholder, and
+    # files without any placeholder are not scanned by the regex at all.
+    if "${" in file_content:
+        values = {name: str(value) for name, value in vars_substitutions.items()}
+        file_content = _VAR_RE.sub(partial(_replace_var, values), file_content)
+
+    # Parse the substituted content back as YAML, naming the loader after the included
+    # file so that its own includes are resolved relative to it
+    included_loader = _Loader(file_content)
+    included_loader.name = resolved_file_path.as_posix()
+    try:
+        data = included_loader.get_single_data()
+    finally:
+        included_loader.dispose()
+    if not vars_substitutions:
+        with _CACHE_LOCK:
+            _PARSED_CACHE[cache_key] = data
+        return copy.deepcopy(data)
+    return data
 
 
 # Register the custom constructor
-yaml.add_constructor("!include", _include_constructor)
+_Loader.add_constructor("!include", _include_constructor)
 
 
 # Process YAML files with the custom constructor
@@ -132,7 +230,7 @@ def process_yaml_files(input_dir: str, output_dir: str) -> None:
     Process YAML files from the input dir and save processed files to the output dir.
 
     This function processes YAML files by applying custom constructors and ensures
-    the output directory is cleaned before saving the processed files.
+    the output directory only contains the files generated from the input directory.
 
     Args:
         input_dir: Path to the input directory containing YAML files.
@@ -140,47 +238,300 @@ def process_yaml_files(input_dir: str, output_dir: str) -> None:
 
     """
     # Create paths objects
-    input_path = Path(input_dir)
+    input_path = Path(input_dir).resolve()
     output_path = Path(output_dir)
-    # Wipe the output directory
-    if output_path.exists():
-        LOGGER.debug("Wiping output directory: %s", output_path)
-        shutil.rmtree(output_path)
+    # Forget the included files from any previous run
+    _FILE_CACHE.clear()
+    _PARSED_CACHE.clear()
+    _RESOLVED_PATHS.clear()
     output_path.mkdir(parents=True, exist_ok=True)
 
+    # List the directories and the non YAML files to copy, as well as the YAML files to
+    # process (except the ones starting with "."), from the input directory
+    kept_dirs, copied_files = _list_input_paths(input_path)
+    files = list(_iter_yaml_files(input_path))
+    kept_files = {
+        *copied_files,
+        *(file.relative_to(input_path) for file in files),
+        Path("README.md"),
+        Path(_MANIFEST_FILE_NAME),
+    }
+
+    # Remove anything which is not generated from the input directory, including the
+    # entries whose type changed (e.g. a file which is now a directory), before
+    # anything is written in their place
+    _remove_orphans(output_path, kept_dirs, kept_files)
+
     # Copy all files from input dir to output dir except yaml files
     LOGGER.debug("Copying files from %s to %s", input_path, output_path)
-    shutil.copytree(
-        input_path,
-        output_path,
-        dirs_exist_ok=True,
-        ignore=shutil.ignore_patterns("*.yaml", "*.yml"),
-    )
+    _sync_files(input_path, output_path, kept_dirs, copied_files)
 
     # Create a README.md file in the output directory
     _create_readme(output_path)
 
-    # Process each YAML file in the input directory except the ones starting with "."
-    for file in input_path.glob("**/*.y[a]ml"):
-        if file.is_file() and not file.name.startswith("."):
-            LOGGER.debug("Processing YAML file: %s", file)
-            with file.open("r") as infile:
-                # Pass the file name to the loader for relative path resolution
-                loader = yaml.Loader(infile)
-                loader.name = (
-                    # Custom attribute to hold the current file full path
-                    file.resolve().as_posix()
-                )
-                data = loader.get_data()
-
-            # Construct the output file path
-            relative_path = file.relative_to(input_path)
-            output_file = output_path / relative_path
-            with output_file.open("w") as outfile:
-                # Add a warning comment to the top of the file
-                outfile.write(AUTO_GENERATED_WARNING)
-                # Write the processed data to the output file
-                yaml.dump(data, outfile, sort_keys=False, encoding="utf-8")
+    manifest = _load_manifest(output_path)
+    with ThreadPoolExecutor() as executor:
+        new_manifest = dict(
+            executor.map(
+                partial(
+                    _process_yaml_file,
+                    input_path=input_path,
+                    output_path=output_path,
+                    manifest=manifest,
+                ),
+                files,
+            )
+        )
+    if new_manifest != manifest:
+        _save_manifest(output_path, new_manifest)
+
+
+def _iter_yaml_files(root: Path) -> Iterator[Path]:
+    """
+    Iterate over the YAML files of a directory and its subdirectories.
+
+    The directories are scanned with `os.scandir`, whose entries carry the file type,
+    so that no extra `stat` call is needed for most of them. Files starting with "."
+    are skipped, as they are only meant to be included by other files.
+    """
+    pending_dirs = [os.fspath(root)]
+    while pending_dirs:
+        with os.scandir(pending_dirs.pop()) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    pending_dirs.append(entry.path)
+                elif (
+                    entry.name.endswith(_YAML_SUFFIXES)
+                    and not entry.name.startswith(".")
+                    and entry.is_file()
+                ):
+                    yield Path(entry.path)
+
+
+def _process_yaml_file(
+    file: Path,
+    input_path: Path,
+    output_path: Path,
+    manifest: dict[str, dict[str, Any]],
+) -> tuple[str, dict[str, Any]]:
+    """
+    Process a YAML file from the input dir and save it into the output dir.
+
+    The output file is left untouched when the manifest shows it already holds the
+    exact same content, so that unchanged files are not reloaded by Home Assistant.
+
+    Returns:
+        The manifest key and entry of the output file.
+
+    """
+    LOGGER.debug("Processing YAML file: %s", file)
+    # Hand the raw bytes to the loader, which detects and decodes the encoding itself
+    with file.open("rb") as infile:
+        _fadvise(infile.fileno(), "POSIX_FADV_SEQUENTIAL")
+        # Pass the file name to the loader for relative path resolution
+        loader = _Loader(infile)
+        # Custom attribute to hold the current file full path
+        loader.name = file.resolve().as_posix()
+        try:
+            data = loader.get_data()
+        finally:
+            loader.dispose()
+
+    buffer = io.BytesIO()
+    # Add a warning comment to the top of the file
+    buffer.write(AUTO_GENERATED_WARNING.encode("utf-8"))
+    yaml.dump(
+        data,
+        buffer,
+        Dumper=_Dumper,
+        encoding="utf-8",
+        allow_unicode=True,
+        default_flow_style=False,
+        sort_keys=False,
+    )
+    content = buffer.getvalue()
+    digest = hashlib.sha1(content, usedforsecurity=False).hexdigest()
+
+    # Construct the output file path
+    relative_path = file.relative_to(input_path)
+    output_file = output_path / relative_path
+    manifest_key = relative_path.as_posix()
+    entry = manifest.get(manifest_key)
+    if entry and entry.get("sha1") == digest and _is_unchanged(output_file, entry):
+        LOGGER.debug("Output file is up to date: %s", output_file)
+        return manifest_key, entry
+
+    # Write the processed data to the output file
+    output_file.write_bytes(content)
+    output_stat = output_file.stat()
+    return manifest_key, {
+        "sha1": digest,
+        "size": output_stat.st_size,
+        "mtime_ns": output_stat.st_mtime_ns,
+    }
+
+
+def _fadvise(fd: int, advice: str) -> None:
+    """
+    Give the kernel a hint about how a whole file is used, when supported.
+
+    Args:
+        fd: File descriptor of the file.
+        advice: Name of the `os.POSIX_FADV_*` constant to use.
+
+    """
+    if hasattr(os, "posix_fadvise"):
+        # A hint failing, e.g. on some file systems, must not fail the processing
+        with contextlib.suppress(OSError):
+            os.posix_fadvise(fd, 0, 0, getattr(os, advice))
+
+
+def _is_unchanged(output_file: Path, entry: dict[str, Any]) -> bool:
+    """Check that an output file was not modified since its manifest entry."""
+    try:
+        output_stat = output_file.stat()
+    except FileNotFoundError:
+        return False
+    return output_stat.st_size == entry.get(
+        "size"
+    ) and output_stat.st_mtime_ns == entry.get("mtime_ns")
+
+
+def _load_manifest(output_path: Path) -> dict[str, dict[str, Any]]:
+    """Load the manifest of the output dir, empty if missing or invalid."""
+    try:
+        with (output_path / _MANIFEST_FILE_NAME).open(encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return manifest if isinstance(manifest, dict) else {}
+
+
+def _save_manifest(output_path: Path, manifest: dict[str, dict[str, Any]]) -> None:
+    """Save the manifest of the output dir."""
+    with (output_path / _MANIFEST_FILE_NAME).open("w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+
+
+def _list_input_paths(input_path: Path) -> tuple[set[Path], set[Path]]:
+    """
+    List the directories and the non YAML files of the input dir.
+
+    Symlinked directories are followed, their content being copied as is.
+
+    Args:
+        input_path: Path to the input directory.
+
+    Returns:
+        The paths of the directories and of the non YAML files, relative to the input
+        dir.
+
+    """
+    dirs: set[Path] = set()
+    files: set[Path] = set()
+    # Follow the symlinked directories, copying their content as copytree would
+    for dir_path, _, file_names in os.walk(input_path, followlinks=True):
+        relative_dir = Path(dir_path).relative_to(input_path)
+        dirs.add(relative_dir)
+        files.update(
+            relative_dir / file_name
+            for file_name in file_names
+            if not file_name.endswith(_YAML_SUFFIXES)
+        )
+    return dirs, files
+
+
+def _sync_files(
+    input_path: Path, output_path: Path, dirs: set[Path], files: set[Path]
+) -> None:
+    """
+    Copy the directories and the non YAML files from the input dir to the output dir.
+
+    Files of the output dir with the same size and modification time as their source
+    are considered up to date and are not copied again.
+
+    Args:
+        input_path: Path to the input directory.
+        output_path: Path to the output directory.
+        dirs: Paths of the directories to create, relative to both dirs.
+        files: Paths of the files to copy, relative to both dirs.
+
+    """
+    # Parents sort before their children
+    for relative_dir in sorted(dirs):
+        (output_path / relative_dir).mkdir(exist_ok=True)
+    for relative_path in files:
+        source = input_path / relative_path
+        target = output_path / relative_path
+        source_stat = source.stat()
+        try:
+            target_stat = target.stat()
+        except FileNotFoundError:
+            target_stat = None
+        if (
+            target_stat is None
+            or target_stat.st_size != source_stat.st_size
+            or target_stat.st_mtime_ns != source_stat.st_mtime_ns
+        ):
+            LOGGER.debug("Copying file: %s", source)
+            # The previous copy has the mode of its source, which may be read-only,
+            # so replace it rather than writing into it
+            target.unlink(missing_ok=True)
+            _fastcopy(source, target)
+            shutil.copystat(source, target)
+
+
+def _fastcopy(source: Path, target: Path) -> None:
+    """
+    Copy the content of a file, using zero-copy system calls when available.
+
+    Falls back to a buffered copy for whatever the system calls could not copy, for
+    instance when they are not supported between the two file systems.
+    """
+    with source.open("rb") as src_file, target.open("wb") as dst_file:
+        src_fd, dst_fd = src_file.fileno(), dst_file.fileno()
+        remaining = os.fstat(src_fd).st_size
+        for copy_function in _ZERO_COPY_FUNCTIONS:
+            try:
+                while remaining > 0:
+                    copied = copy_function(src_fd, dst_fd, remaining)
+                    if not copied:
+                        break
+                    remaining -= copied
+            except OSError:
+                # Not supported for these files, try the next function
+                continue
+            break
+        # Copy what is left, from the current offsets up to the end of the file
+        shutil.copyfileobj(src_file, dst_file, _COPY_BUFFER_SIZE)
+
+
+def _remove_orphans(
+    output_path: Path, kept_dirs: set[Path], kept_files: set[Path]
+) -> None:
+    """
+    Remove the files and directories of the output dir which are not kept.
+
+    An entry is also removed when it is kept with another type, e.g. a file in place of
+    a kept directory, so that it can be replaced.
+    """
+    for dir_path, dir_names, file_names in os.walk(output_path):
+        current_dir = Path(dir_path)
+        relative_dir = current_dir.relative_to(output_path)
+        for file_name in file_names:
+            if relative_dir / file_name not in kept_files:
+                LOGGER.debug("Removing orphan file: %s", current_dir / file_name)
+                (current_dir / file_name).unlink()
+        for dir_name in list(dir_names):
+            orphan_dir = current_dir / dir_name
+            if relative_dir / dir_name not in kept_dirs or orphan_dir.is_symlink():
+                # Do not walk into the removed directory
+                dir_names.remove(dir_name)
+                LOGGER.debug("Removing orphan directory: %s", orphan_dir)
+                if orphan_dir.is_symlink():
+                    orphan_dir.unlink()
+                else:
+                    shutil.rmtree(orphan_dir)
 
 
 def _create_readme(output_dir: Path) -> None: